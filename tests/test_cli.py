@@ -2,8 +2,13 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+import json
+import subprocess
+import textwrap
+import threading
+import time
 from click.testing import CliRunner
-from uploader.cli import main
+from uploader.cli import main, report_cluster_overlap
 from unittest.mock import patch, MagicMock
 
 
@@ -23,13 +28,25 @@ def test_cli_help():
     assert "Usage:" in result.output
 
 
-@patch("uploader.cli.create_table_and_copy")
+def test_cli_requires_target(tmp_path):
+    """
+    Test that the CLI refuses to run without --targets-file or a full single target.
+    """
+    runner = CliRunner()
+    result = runner.invoke(main, ["--directory", str(tmp_path), "--bucket", "test-bucket"])
+
+    assert result.exit_code != 0
+    assert "--targets-file" in result.output
+
+
+@patch("uploader.fanout.run_post_load_maintenance")
+@patch("uploader.fanout.create_table_and_copy")
 @patch("uploader.cli.infer_schema_and_generate_sql")
 @patch("uploader.cli.upload_to_s3")
 @patch("uploader.cli.create_redshift_cluster")
 @patch("uploader.cli.create_iam_role")
 @patch("uploader.cli.create_s3_bucket")
-def test_full_cli_flow(mock_bucket, mock_role, mock_cluster, mock_upload, mock_schema, mock_copy, tmp_path):
+def test_full_cli_flow(mock_bucket, mock_role, mock_cluster, mock_upload, mock_schema, mock_copy, mock_maintenance, tmp_path):
     """
     Simulates CLI run end-to-end with mocks and a real temp CSV directory.
     """
@@ -56,3 +73,164 @@ def test_full_cli_flow(mock_bucket, mock_role, mock_cluster, mock_upload, mock_s
     assert mock_cluster.called
     assert mock_upload.called
     assert mock_copy.called
+    mock_maintenance.assert_called_once()
+    assert mock_maintenance.call_args[1]["table_names"] == ["mock_table"]
+
+
+def test_report_cluster_overlap(capsys):
+    """
+    Test that report_cluster_overlap reports the portion of the cluster wait
+    that was hidden behind other pipeline steps.
+
+    Expected behavior:
+    - Hidden time is the cluster time minus the time spent blocked on it
+    - Hidden time never goes negative
+    """
+    assert report_cluster_overlap(600.0, 120.0) == 480.0
+    assert "80%" in capsys.readouterr().out
+    assert report_cluster_overlap(0.0, 1.0) == 0.0
+    assert "already available" in capsys.readouterr().out
+
+
+@patch("uploader.cli.upload_to_s3")
+@patch("uploader.cli.create_redshift_cluster")
+@patch("uploader.cli.create_iam_role")
+@patch("uploader.cli.create_s3_bucket")
+def test_cli_fails_fast_while_cluster_provisions(mock_bucket, mock_role, mock_cluster, mock_upload, tmp_path):
+    """
+    Test that an error in the upload step is raised right away instead of
+    waiting for the background cluster waiter to finish.
+    """
+    cluster_released = threading.Event()
+    mock_cluster.side_effect = lambda **kwargs: cluster_released.wait(30)
+    mock_upload.side_effect = RuntimeError("upload failed")
+
+    runner = CliRunner()
+    start = time.monotonic()
+    try:
+        result = runner.invoke(main, [
+            "--directory", str(tmp_path),
+            "--bucket", "test-bucket",
+            "--cluster-id", "test-cluster",
+            "--db-name", "testdb",
+            "--user", "admin",
+            "--password", "pw"
+        ])
+        elapsed = time.monotonic() - start
+    finally:
+        cluster_released.set()
+
+    assert isinstance(result.exception, RuntimeError)
+    assert elapsed < 10
+
+
+def test_cli_process_exits_while_cluster_provisions(tmp_path):
+    """
+    Test that the CLI process itself exits promptly on an upload error while a
+    cluster is still provisioning, i.e. interpreter exit does not wait for the
+    background cluster_available waiter.
+    """
+    script = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})
+        from unittest.mock import patch
+        from uploader.cli import main
+
+        with patch("uploader.cli.create_s3_bucket"), \\
+             patch("uploader.cli.create_iam_role", return_value="arn:aws:iam::123:role/test"), \\
+             patch("uploader.cli.create_redshift_cluster", side_effect=lambda **kwargs: time.sleep(30)), \\
+             patch("uploader.cli.upload_to_s3", side_effect=RuntimeError("upload failed")):
+            main([
+                "--directory", {str(tmp_path)!r}, "--bucket", "test-bucket",
+                "--cluster-id", "test-cluster", "--db-name", "testdb",
+                "--user", "admin", "--password", "pw"
+            ])
+    """)
+
+    start = time.monotonic()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=25)
+    elapsed = time.monotonic() - start
+
+    assert result.returncode != 0
+    assert "RuntimeError: upload failed" in result.stderr
+    assert elapsed < 20
+
+
+@patch("uploader.fanout.run_post_load_maintenance")
+@patch("uploader.fanout.create_table_and_copy")
+@patch("uploader.cli.infer_schema_and_generate_sql")
+@patch("uploader.cli.upload_to_s3")
+@patch("uploader.cli.create_redshift_cluster")
+@patch("uploader.cli.create_iam_role")
+@patch("uploader.cli.create_s3_bucket")
+def test_cli_cluster_failure_is_reported_per_target(mock_bucket, mock_role, mock_cluster, mock_upload,
+                                                    mock_schema, mock_copy, mock_maintenance, tmp_path):
+    """
+    Test that one target's cluster failing to provision does not stop the others.
+
+    Expected behavior:
+    - The healthy target is still loaded
+    - The failed target appears in the load report and the CLI exits non-zero
+    """
+    def create_cluster(**kwargs):
+        if kwargs["cluster_id"] == "prod":
+            raise RuntimeError("InsufficientClusterCapacity")
+        return False
+
+    mock_cluster.side_effect = create_cluster
+    mock_schema.return_value = ("mock_table", "CREATE TABLE mock_table (id INT);")
+    mock_copy.return_value = True
+    (tmp_path / "sample.csv").write_text("id,name\n1,Alice")
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([
+        {"name": "staging", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p"},
+        {"name": "prod", "cluster_id": "prod", "db_name": "dw", "user": "u", "password": "p"},
+    ]))
+
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        "--directory", str(tmp_path),
+        "--bucket", "test-bucket",
+        "--targets-file", str(targets_file)
+    ])
+
+    assert result.exit_code != 0
+    assert {call[1]["cluster_id"] for call in mock_copy.call_args_list} == {"stg"}
+    assert "[staging] ✅" in result.output
+    assert "[prod] ❌ FAILED: InsufficientClusterCapacity" in result.output
+
+
+@patch("uploader.fanout.run_post_load_maintenance")
+@patch("uploader.fanout.create_table_and_copy")
+@patch("uploader.cli.infer_schema_and_generate_sql")
+@patch("uploader.cli.upload_to_s3")
+@patch("uploader.cli.create_redshift_cluster")
+@patch("uploader.cli.create_iam_role")
+@patch("uploader.cli.create_s3_bucket")
+def test_cli_provisions_shared_cluster_once(mock_bucket, mock_role, mock_cluster, mock_upload,
+                                            mock_schema, mock_copy, mock_maintenance, tmp_path):
+    """
+    Test that targets sharing a cluster with different databases provision it once
+    and are both loaded.
+    """
+    mock_cluster.return_value = True
+    mock_schema.return_value = ("mock_table", "CREATE TABLE mock_table (id INT);")
+    mock_copy.return_value = True
+    (tmp_path / "sample.csv").write_text("id,name\n1,Alice")
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([
+        {"name": "staging", "cluster_id": "shared", "db_name": "staging", "user": "u", "password": "p"},
+        {"name": "prod", "cluster_id": "shared", "db_name": "prod", "user": "u", "password": "p"},
+    ]))
+
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        "--directory", str(tmp_path),
+        "--bucket", "test-bucket",
+        "--targets-file", str(targets_file)
+    ])
+
+    assert result.exit_code == 0
+    mock_cluster.assert_called_once()
+    assert mock_cluster.call_args[1]["db_name"] == "staging"
+    assert {call[1]["db_name"] for call in mock_copy.call_args_list} == {"staging", "prod"}
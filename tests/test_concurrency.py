@@ -0,0 +1,175 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from unittest.mock import MagicMock
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+from uploader.concurrency import AdaptiveConcurrencyController, classify_error
+
+
+def _slow_down():
+    return ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+                        "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject")
+
+
+def test_classify_error():
+    """
+    Test that S3 throttling, transient and permanent errors are told apart.
+    """
+    assert classify_error(_slow_down()) == "throttle"
+    assert classify_error(ClientError({"Error": {"Code": "InternalError"}}, "PutObject")) == "transient"
+    assert classify_error(ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")) is None
+    assert classify_error(ValueError("bad input")) is None
+
+
+def test_controller_additive_increase_multiplicative_decrease():
+    """
+    Test the AIMD behaviour of the controller.
+
+    Expected behavior:
+    - Healthy calls grow the limit by about one per limit's worth of calls
+    - The limit never exceeds max_limit
+    - A throttle halves the limit, at most once per cooldown
+    """
+    controller = AdaptiveConcurrencyController("test", max_limit=8, initial_limit=2, cooldown=60,
+                                               latency_factor=None, sleep=MagicMock())
+
+    for _ in range(2):
+        controller.call(lambda: None)
+    assert controller.current_limit == 2
+    for _ in range(3):
+        controller.call(lambda: None)
+    assert controller.current_limit == 3
+    for _ in range(100):
+        controller.call(lambda: None)
+    assert controller.current_limit == 8
+
+    controller.observe_queue_depth(0)
+    assert controller.current_limit == 8
+    controller.max_queue_depth = 2
+    controller.observe_queue_depth(5)
+    assert controller.current_limit == 4
+    controller.observe_queue_depth(5)
+    assert controller.current_limit == 4
+
+
+def test_controller_retries_transient_errors():
+    """
+    Test that throttled calls are retried with backoff and cut concurrency.
+
+    Expected behavior:
+    - The call succeeds after two SlowDown errors
+    - sleep is called once per retry with a delay within the backoff cap
+    - The limit is halved once (cooldown)
+    """
+    sleep = MagicMock()
+    controller = AdaptiveConcurrencyController("test", max_limit=8, initial_limit=8, base_delay=1.0,
+                                               max_delay=10.0, sleep=sleep)
+    func = MagicMock(side_effect=[_slow_down(), _slow_down(), "ok"])
+
+    assert controller.call(func, "a", key="b") == "ok"
+    assert func.call_count == 3
+    func.assert_called_with("a", key="b")
+    assert sleep.call_count == 2
+    assert sleep.call_args_list[0].args[0] <= 1.0
+    assert sleep.call_args_list[1].args[0] <= 2.0
+    assert controller.stats["throttles"] == 2
+    assert controller.current_limit == 4
+    assert controller.in_flight == 0
+
+
+def test_controller_gives_up():
+    """
+    Test that permanent errors are raised immediately and transient ones
+    are raised once retries run out.
+    """
+    controller = AdaptiveConcurrencyController("test", max_limit=2, max_retries=2, sleep=MagicMock())
+
+    permanent = MagicMock(side_effect=ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject"))
+    with pytest.raises(ClientError):
+        controller.call(permanent)
+    assert permanent.call_count == 1
+
+    transient = MagicMock(side_effect=_slow_down())
+    with pytest.raises(ClientError):
+        controller.call(transient)
+    assert transient.call_count == 3
+    assert controller.stats["failures"] == 2
+
+
+def test_controller_bandwidth_cap():
+    """
+    Test that consume() sleeps once the bandwidth budget is used up.
+    """
+    sleep = MagicMock()
+    controller = AdaptiveConcurrencyController("test", max_limit=1, max_bandwidth=1000, sleep=sleep)
+
+    controller.consume(1000)
+    sleep.assert_not_called()
+    controller.consume(500)
+    assert sleep.call_args.args[0] == pytest.approx(0.5, abs=0.01)
+
+
+def test_record_latency_mixed_sizes():
+    """
+    Test that latency is only compared between calls of similar size.
+
+    Expected behavior:
+    - A small file after a large one does not count as congestion, even though
+      it is far slower per byte
+    - A call well above the average for its size does
+    """
+    controller = AdaptiveConcurrencyController("test", max_limit=8, initial_limit=8, sleep=MagicMock())
+
+    assert controller.record_latency(20.0, size=500 * 1024 * 1024) is True
+    assert controller.record_latency(1.0, size=50 * 1024) is True
+    assert controller.record_latency(1.2, size=60 * 1024) is True
+    assert controller.current_limit == 8
+
+    assert controller.record_latency(10.0, size=50 * 1024) is False
+    assert controller.current_limit == 4
+    assert controller.record_latency(22.0, size=500 * 1024 * 1024) is True
+
+
+def _upload_failed(code):
+    """Raise and return a real S3UploadFailedError the way upload_file does."""
+    try:
+        try:
+            raise ClientError({"Error": {"Code": code, "Message": "boom"}}, "PutObject")
+        except ClientError as e:
+            raise S3UploadFailedError(f"Failed to upload data.csv to bucket/data.csv: {e}")
+    except S3UploadFailedError as wrapped:
+        return wrapped
+
+
+def test_classify_wrapped_upload_errors():
+    """
+    Test that ClientErrors wrapped by upload_file in S3UploadFailedError are
+    classified by their underlying code, with or without the chained error.
+    """
+    assert classify_error(_upload_failed("SlowDown")) == "throttle"
+    assert classify_error(_upload_failed("InternalError")) == "transient"
+    assert classify_error(_upload_failed("RequestTimeout")) == "transient"
+    assert classify_error(_upload_failed("ServiceUnavailable")) == "transient"
+    assert classify_error(_upload_failed("AccessDenied")) is None
+
+    unchained = S3UploadFailedError(
+        "Failed to upload data.csv to bucket/data.csv: An error occurred (InternalError) "
+        "when calling the PutObject operation: We encountered an internal error."
+    )
+    assert classify_error(unchained) == "transient"
+
+
+def test_controller_retries_wrapped_upload_error():
+    """
+    Test that a wrapped InternalError from upload_file is retried.
+    """
+    controller = AdaptiveConcurrencyController("S3", max_limit=2, sleep=MagicMock())
+    upload = MagicMock(side_effect=[_upload_failed("InternalError"), None])
+
+    controller.call(upload)
+
+    assert upload.call_count == 2
+    assert controller.stats["retries"] == 1
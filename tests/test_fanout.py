@@ -0,0 +1,125 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import json
+import pytest
+from unittest.mock import patch
+from uploader.fanout import load_targets_file, fan_out_load, print_fan_out_report
+
+
+def test_load_targets_file(tmp_path):
+    """
+    Test that load_targets_file reads a JSON list of targets and fills in defaults.
+
+    Expected behavior:
+    - Targets without a name are named '<cluster_id>/<db_name>'
+    - Region and max_concurrency fall back to their defaults
+    """
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([
+        {"name": "staging", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p", "max_concurrency": 4},
+        {"cluster_id": "prod", "db_name": "dw", "user": "u", "password": "p", "region": "eu-west-1"},
+    ]))
+
+    targets = load_targets_file(targets_file, default_region="us-east-1")
+
+    assert [t["name"] for t in targets] == ["staging", "prod/dw"]
+    assert targets[0]["region"] == "us-east-1"
+    assert targets[0]["max_concurrency"] == 4
+    assert targets[1]["region"] == "eu-west-1"
+    assert targets[1]["max_concurrency"] == 4
+
+
+def test_load_targets_file_missing_fields(tmp_path):
+    """
+    Test that load_targets_file rejects targets without connection details.
+    """
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([{"cluster_id": "stg"}]))
+
+    with pytest.raises(ValueError, match="missing"):
+        load_targets_file(targets_file)
+
+
+def test_load_targets_file_duplicate_names(tmp_path):
+    """
+    Test that load_targets_file rejects two targets with the same name, including
+    the default '<cluster_id>/<db_name>' name.
+    """
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([
+        {"cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p"},
+        {"cluster_id": "stg", "db_name": "dev", "user": "other", "password": "p"},
+    ]))
+
+    with pytest.raises(ValueError, match="Duplicate"):
+        load_targets_file(targets_file)
+
+
+def test_load_targets_file_duplicate_database(tmp_path):
+    """
+    Test that load_targets_file rejects two differently named targets that
+    would load the same database on the same cluster.
+    """
+    targets_file = tmp_path / "targets.json"
+    targets_file.write_text(json.dumps([
+        {"name": "a", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p"},
+        {"name": "b", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p"},
+        {"name": "c", "cluster_id": "stg", "db_name": "other", "user": "u", "password": "p"},
+    ]))
+
+    with pytest.raises(ValueError, match="more than once"):
+        load_targets_file(targets_file)
+
+
+@patch("uploader.fanout.run_post_load_maintenance")
+@patch("uploader.fanout.create_table_and_copy")
+def test_fan_out_load(mock_copy, mock_maintenance):
+    """
+    Test that fan_out_load COPYs every table into every target and reports per target.
+
+    Expected behavior:
+    - create_table_and_copy is called once per (target, table)
+    - A failing table only marks its own target as failed
+    - Maintenance only runs on tables that loaded
+    """
+    mock_copy.side_effect = lambda **kw: not (kw["cluster_id"] == "prod" and kw["table_name"] == "orders")
+    targets = [
+        {"name": "staging", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p",
+         "region": "us-east-1", "max_concurrency": 2},
+        {"name": "prod", "cluster_id": "prod", "db_name": "dw", "user": "u", "password": "p",
+         "region": "us-east-1", "max_concurrency": 1},
+    ]
+    schemas = [
+        (Path("orders.csv"), "orders", "CREATE TABLE orders (id INT);"),
+        (Path("customers.csv"), "customers", "CREATE TABLE customers (id INT);"),
+    ]
+
+    reports = fan_out_load(targets, schemas, "bucket", "arn:aws:iam::123:role/test")
+
+    assert mock_copy.call_count == 4
+    assert reports["staging"] == {"orders": True, "customers": True}
+    assert reports["prod"] == {"orders": False, "customers": True}
+    prod_call = [c for c in mock_maintenance.call_args_list if c[1]["cluster_id"] == "prod"][0]
+    assert prod_call[1]["table_names"] == ["customers"]
+    assert print_fan_out_report(reports) is False
+
+
+@patch("uploader.redshift_utils.get_redshift_connection")
+@patch("uploader.fanout.create_table_and_copy")
+def test_fan_out_load_keeps_results_when_maintenance_cannot_connect(mock_copy, mock_get_conn):
+    """
+    Test that a maintenance connection failure does not turn a loaded target
+    into a failed one.
+    """
+    mock_copy.return_value = True
+    mock_get_conn.side_effect = RuntimeError("could not connect to server")
+    targets = [{"name": "staging", "cluster_id": "stg", "db_name": "dev", "user": "u", "password": "p",
+                "region": "us-east-1", "max_concurrency": 1}]
+    schemas = [(Path("orders.csv"), "orders", "CREATE TABLE orders (id INT);")]
+
+    reports = fan_out_load(targets, schemas, "bucket", "arn:aws:iam::123:role/test")
+
+    assert reports["staging"] == {"orders": True}
+    assert print_fan_out_report(reports) is True
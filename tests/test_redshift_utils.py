@@ -2,14 +2,19 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+import psycopg2
 import pytest
 from unittest.mock import patch, MagicMock
 from uploader.redshift_utils import (
     create_redshift_cluster,
     authorize_redshift_ingress,
     get_redshift_connection,
-    create_table_and_copy
+    create_table_and_copy,
+    get_tables_needing_maintenance,
+    run_post_load_maintenance,
+    reconcile_row_counts
 )
+from uploader.concurrency import AdaptiveConcurrencyController
 
 
 @patch("boto3.client")
@@ -166,3 +171,153 @@ def test_create_table_and_copy(mock_boto, mock_connect, mock_requests_get):
     mock_cursor.execute.assert_any_call("CREATE TABLE test_table (id INT);")
     assert any("COPY test_table" in str(call.args[0]) for call in mock_cursor.execute.call_args_list)
     mock_conn.commit.assert_called_once()
+
+
+def test_create_table_and_copy_compupdate_statupdate():
+    """
+    Test that COMPUPDATE/STATUPDATE are added to the COPY only when requested.
+
+    Expected behavior:
+    - COPY contains COMPUPDATE OFF and STATUPDATE ON when passed
+    - COPY contains neither option by default
+    """
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("uploader.redshift_utils.authorize_redshift_ingress"), \
+         patch("uploader.redshift_utils.get_redshift_connection", return_value=mock_conn):
+        kwargs = dict(
+            table_name="t", create_sql="CREATE TABLE t (id INT);", bucket="b", filename="t.csv",
+            cluster_id="c", db_name="d", user="u", password="p", region="us-east-1",
+            role_arn="arn:aws:iam::123:role/test"
+        )
+        create_table_and_copy(**kwargs, compupdate="off", statupdate="on")
+        copy_sql = mock_cursor.execute.call_args_list[-1].args[0]
+        assert "COMPUPDATE OFF" in copy_sql
+        assert "STATUPDATE ON" in copy_sql
+
+        mock_cursor.reset_mock()
+        create_table_and_copy(**kwargs)
+        copy_sql = mock_cursor.execute.call_args_list[-1].args[0]
+        assert "COMPUPDATE" not in copy_sql
+        assert "STATUPDATE" not in copy_sql
+        assert "REGION" not in copy_sql
+
+        mock_cursor.reset_mock()
+        create_table_and_copy(**kwargs, bucket_region="us-east-1")
+        assert "REGION" not in mock_cursor.execute.call_args_list[-1].args[0]
+
+        mock_cursor.reset_mock()
+        create_table_and_copy(**kwargs, bucket_region="eu-west-1")
+        assert "REGION 'eu-west-1'" in mock_cursor.execute.call_args_list[-1].args[0]
+
+
+def test_get_tables_needing_maintenance():
+    """
+    Test that only tables over the stats_off/unsorted thresholds are selected.
+
+    Expected behavior:
+    - Tables with stale statistics above analyze_threshold are analyzed
+    - Tables with unsorted rows above vacuum_threshold are vacuumed
+    - NULL unsorted (no sort key) is ignored
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [
+        ("orders", 25.0, 1.0),
+        ("customers", 0.0, 40.0),
+        ("reviews", 2.0, None),
+    ]
+
+    to_analyze, to_vacuum = get_tables_needing_maintenance(
+        mock_cursor, ["orders", "customers", "reviews"], analyze_threshold=10.0, vacuum_threshold=5.0
+    )
+
+    assert to_analyze == ["orders"]
+    assert to_vacuum == ["customers"]
+
+
+@patch("uploader.redshift_utils.get_redshift_connection")
+def test_run_post_load_maintenance(mock_get_conn):
+    """
+    Test that run_post_load_maintenance runs VACUUM/ANALYZE outside a transaction
+    and only on tables that need it.
+    """
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("orders", 50.0, 50.0), ("customers", 0.0, 0.0)]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_get_conn.return_value = mock_conn
+
+    run_post_load_maintenance(["orders", "customers"], "c", "d", "u", "p", "us-east-1")
+
+    assert mock_conn.autocommit is True
+    assert 'current_schema()' in mock_cursor.execute.call_args_list[0].args[0]
+    mock_cursor.execute.assert_any_call("VACUUM orders")
+    mock_cursor.execute.assert_any_call("ANALYZE orders")
+    assert not any("customers" in str(call.args[0]) for call in mock_cursor.execute.call_args_list[1:])
+    mock_conn.close.assert_called_once()
+
+    mock_cursor.reset_mock()
+    run_post_load_maintenance(["orders"], "c", "d", "u", "p", "us-east-1", vacuum_to_percent=99)
+    mock_cursor.execute.assert_any_call("VACUUM orders TO 99 PERCENT")
+
+
+def test_reconcile_row_counts():
+    """
+    Test that reconcile_row_counts compares source rows with loaded + rejected rows.
+
+    Expected behavior:
+    - Loaded + rejected equal to the source count is a match
+    - Anything else is flagged as a mismatch
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.side_effect = [(98,), (2,)]
+    assert reconcile_row_counts(mock_cursor, "orders", 100) == (98, 2, True)
+
+    mock_cursor.fetchone.side_effect = [(90,), (0,)]
+    assert reconcile_row_counts(mock_cursor, "orders", 100) == (90, 0, False)
+
+
+@patch("uploader.redshift_utils.get_redshift_connection")
+@patch("uploader.redshift_utils.authorize_redshift_ingress")
+def test_create_table_and_copy_retries_dropped_connection(mock_ingress, mock_get_conn):
+    """
+    Test that a connection dropped mid-COPY is retried on a fresh connection.
+
+    Expected behavior:
+    - rollback is not attempted on the closed connection
+    - The OperationalError reaches the controller and the load is retried
+    """
+    dropped_conn = MagicMock(closed=2)
+    dropped_conn.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+    dropped_cursor = MagicMock()
+    dropped_cursor.execute.side_effect = psycopg2.OperationalError("server closed the connection unexpectedly")
+    dropped_conn.cursor.return_value = dropped_cursor
+
+    healthy_conn = MagicMock(closed=0)
+    mock_get_conn.side_effect = [dropped_conn, healthy_conn]
+    controller = AdaptiveConcurrencyController("test", max_limit=1, max_retries=1, sleep=MagicMock())
+
+    assert create_table_and_copy(
+        table_name="t", create_sql="CREATE TABLE t (id INT);", bucket="b", filename="t.csv",
+        cluster_id="c", db_name="d", user="u", password="p", region="us-east-1",
+        role_arn="arn:aws:iam::123:role/test", controller=controller
+    ) is True
+
+    dropped_conn.rollback.assert_not_called()
+    assert mock_get_conn.call_count == 2
+    healthy_conn.commit.assert_called_once()
+    assert controller.stats["retries"] == 1
+
+
+@patch("uploader.redshift_utils.get_redshift_connection")
+def test_run_post_load_maintenance_connection_failure(mock_get_conn, capsys):
+    """
+    Test that failing to connect for maintenance is logged, not raised.
+    """
+    mock_get_conn.side_effect = psycopg2.OperationalError("could not connect to server")
+
+    run_post_load_maintenance(["orders"], "c", "d", "u", "p", "us-east-1")
+
+    assert "Maintenance error: could not connect to server" in capsys.readouterr().out
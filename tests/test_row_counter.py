@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import csv
+import io
+from uploader.row_counter import count_csv_rows
+
+
+def _write_sample(path, n_rows=200):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(["id", "review", "score"])
+    for i in range(n_rows):
+        # Every third review spans lines and contains escaped quotes
+        review = f'line one\nsaid "hi" #{i}' if i % 3 == 0 else f"plain {i}"
+        writer.writerow([i, review, i * 1.5])
+    path.write_text(buf.getvalue())
+    return buf.getvalue()
+
+
+def test_count_csv_rows_quoted_newlines(tmp_path):
+    """
+    Test that newlines inside quoted fields are not counted as rows.
+
+    Expected behavior:
+    - rows includes the header, data_rows does not
+    """
+    sample_csv = tmp_path / "sample.csv"
+    _write_sample(sample_csv)
+
+    result = count_csv_rows(sample_csv, workers=1)
+
+    assert result["rows"] == 201
+    assert result["data_rows"] == 200
+    assert result["boundaries"] == [0]
+
+
+def test_count_csv_rows_parallel_chunks(tmp_path):
+    """
+    Test that counting across many small chunks in several processes matches
+    a single in-process scan, and that recorded boundaries are real row starts.
+
+    Expected behavior:
+    - Chunks that begin inside a quoted field are handled correctly
+    - Every boundary is the start of a row as parsed by the csv module
+    """
+    sample_csv = tmp_path / "sample.csv"
+    text = _write_sample(sample_csv)
+    data = text.encode()
+
+    result = count_csv_rows(sample_csv, chunk_size=97, workers=4)
+
+    assert result["data_rows"] == 200
+    assert result["size"] == len(data)
+
+    row_starts = {0}
+    reader = csv.reader(io.StringIO(text, newline=""))
+    offset = 0
+    for row in reader:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(row)
+        offset += len(buf.getvalue().encode())
+        row_starts.add(offset)
+    assert len(result["boundaries"]) > 10
+    assert set(result["boundaries"]) <= row_starts
+
+
+def test_count_csv_rows_no_trailing_newline(tmp_path):
+    """
+    Test that a final row without a trailing newline is counted, and that
+    an empty file has no rows.
+    """
+    sample_csv = tmp_path / "sample.csv"
+    sample_csv.write_text("id,name\n1,Alice\n2,Bob")
+    assert count_csv_rows(sample_csv, workers=1)["data_rows"] == 2
+
+    empty_csv = tmp_path / "empty.csv"
+    empty_csv.write_text("")
+    assert count_csv_rows(empty_csv)["rows"] == 0
+
+
+def test_count_csv_rows_small_skeleton_batches(tmp_path, monkeypatch):
+    """
+    Test that splitting the quote/newline skeleton into many small batches
+    gives the same counts and boundaries as one batch.
+    """
+    sample_csv = tmp_path / "sample.csv"
+    _write_sample(sample_csv)
+    expected = count_csv_rows(sample_csv, chunk_size=211, workers=1)
+
+    monkeypatch.setattr("uploader.row_counter._SKELETON_BATCH", 3)
+    result = count_csv_rows(sample_csv, chunk_size=211, workers=1)
+
+    assert result == expected
+    assert result["data_rows"] == 200
@@ -4,6 +4,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from unittest.mock import patch, MagicMock
 from uploader.s3_utils import create_s3_bucket, upload_to_s3
+from uploader.concurrency import AdaptiveConcurrencyController
 from botocore.exceptions import ClientError
 
 
@@ -64,3 +65,24 @@ def test_upload_to_s3_success(mock_boto):
 
     upload_to_s3(str(path), "test-bucket", region="us-east-1")
     mock_s3.upload_file.assert_called_once()
+
+
+@patch("boto3.client")
+def test_upload_to_s3_with_controller(mock_boto):
+    """
+    Test that upload_to_s3 routes uploads through the concurrency controller
+    and passes its bandwidth callback to boto3.
+    """
+    mock_s3 = MagicMock()
+    mock_boto.return_value = mock_s3
+    controller = AdaptiveConcurrencyController("S3", max_limit=4, sleep=MagicMock())
+
+    path = Path("tests/test_data")
+    path.mkdir(exist_ok=True, parents=True)
+    (path / "upload_test.csv").write_text("col1,col2\nval1,val2")
+
+    upload_to_s3(str(path), "test-bucket", region="us-east-1", controller=controller)
+
+    mock_s3.upload_file.assert_called_once()
+    assert mock_s3.upload_file.call_args[1]["Callback"] == controller.consume
+    assert controller.stats["calls"] == 1
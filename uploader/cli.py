@@ -1,62 +1,191 @@
 import click
+import time
+import threading
+from concurrent.futures import Future
 from pathlib import Path
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 
+from uploader.concurrency import AdaptiveConcurrencyController
+from uploader.fanout import DEFAULT_MAX_CONCURRENCY, fan_out_load, load_targets_file, make_target, print_fan_out_report
 from uploader.iam_utils import create_iam_role
-from uploader.redshift_utils import create_redshift_cluster, create_table_and_copy
+from uploader.redshift_utils import create_redshift_cluster
+from uploader.row_counter import count_csv_rows
 from uploader.schema_generator import infer_schema_and_generate_sql
 from uploader.s3_utils import create_s3_bucket, upload_to_s3
 
 
+def _timed(func, *args, **kwargs):
+    """Run func and return (result, elapsed_seconds). Used to time background provisioning."""
+    start = time.monotonic()
+    result = func(*args, **kwargs)
+    return result, time.monotonic() - start
+
+
+def _run_in_background(func, *args, **kwargs):
+    """
+    Run func on a daemon thread and return a Future for its result.
+
+    Daemon threads are not joined at interpreter exit, so a failure elsewhere in
+    the pipeline exits right away instead of waiting out a cluster_available
+    waiter that is still running.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def report_cluster_overlap(cluster_seconds, blocked_seconds):
+    """
+    Print how much of the cluster provisioning wait was hidden behind other steps.
+    cluster_seconds is 0 when no cluster had to be created.
+
+    Returns:
+    - Seconds of the cluster wait that overlapped with bucket/IAM/upload/inference work
+    """
+    if cluster_seconds <= 0:
+        print("[Pipeline] Cluster(s) already available; no provisioning wait to hide.")
+        return 0.0
+    hidden = max(cluster_seconds - blocked_seconds, 0.0)
+    pct = hidden / cluster_seconds * 100
+    print(f"[Pipeline] Cluster provisioning took {cluster_seconds:.1f}s; "
+          f"blocked on it for {blocked_seconds:.1f}s; hidden {hidden:.1f}s ({pct:.0f}%).")
+    return hidden
+
+
 @click.command()
 @click.option('--directory', required=True, type=click.Path(exists=True), help='Directory containing CSV files')
 @click.option('--bucket', required=True, help='S3 bucket name to create/use')
-@click.option('--cluster-id', required=True, help='Redshift cluster identifier')
-@click.option('--db-name', required=True, help='Redshift database name')
-@click.option('--user', required=True, help='Redshift master username')
-@click.option('--password', required=True, help='Redshift master password')
+@click.option('--cluster-id', help='Redshift cluster identifier')
+@click.option('--db-name', help='Redshift database name')
+@click.option('--user', help='Redshift master username')
+@click.option('--password', help='Redshift master password')
+@click.option('--targets-file', type=click.Path(exists=True),
+              help='JSON file listing several Redshift targets to load into (replaces --cluster-id/--db-name/--user/--password)')
+@click.option('--max-concurrency', default=DEFAULT_MAX_CONCURRENCY,
+              help=f'Upper bound on concurrent COPYs for the --cluster-id target (default: {DEFAULT_MAX_CONCURRENCY})')
+@click.option('--max-upload-concurrency', default=8, help='Upper bound on concurrent S3 uploads (default: 8)')
+@click.option('--max-bandwidth', type=float, default=None, help='Cap on S3 upload bandwidth in MB/s (default: uncapped)')
+@click.option('--max-retries', default=5, help='Retries for throttled or transient S3/Redshift errors (default: 5)')
+@click.option('--max-wlm-queue', default=2, help='Back off COPY concurrency when more WLM queries are queued (default: 2)')
 @click.option('--role-name', default='RedshiftS3AccessRole', help='IAM Role name for Redshift to access S3')
 @click.option('--region', default='us-east-1', help='AWS region (default: us-east-1)')
-def main(directory, bucket, cluster_id, db_name, user, password, role_name, region):
-    print("=== Step 1: Create or Verify S3 Bucket ===")
-    create_s3_bucket(bucket, region)
+@click.option('--compupdate', type=click.Choice(['ON', 'OFF', 'PRESET'], case_sensitive=False), default=None,
+              help='COMPUPDATE setting for COPY (default: Redshift default)')
+@click.option('--statupdate', type=click.Choice(['ON', 'OFF'], case_sensitive=False), default=None,
+              help='STATUPDATE setting for COPY (default: Redshift default)')
+@click.option('--analyze-threshold', default=10.0, help='ANALYZE tables whose stale statistics exceed this percent (default: 10)')
+@click.option('--vacuum-threshold', default=5.0, help='VACUUM tables whose unsorted rows exceed this percent (default: 5)')
+@click.option('--vacuum-to-percent', type=click.IntRange(0, 100), default=None,
+              help='VACUUM sort target percent (default: Redshift default of 95)')
+@click.option('--skip-maintenance', is_flag=True, help='Skip the post-load ANALYZE/VACUUM stage')
+@click.option('--skip-reconcile', is_flag=True, help='Skip counting source rows and reconciling them after COPY')
+def main(directory, bucket, cluster_id, db_name, user, password, targets_file, max_concurrency,
+         max_upload_concurrency, max_bandwidth, max_retries, max_wlm_queue, role_name, region,
+         compupdate, statupdate, analyze_threshold, vacuum_threshold, vacuum_to_percent, skip_maintenance,
+         skip_reconcile):
+    if targets_file:
+        targets = load_targets_file(targets_file, default_region=region)
+    elif all([cluster_id, db_name, user, password]):
+        targets = [make_target(cluster_id, db_name, user, password, region, max_concurrency)]
+    else:
+        raise click.UsageError("Provide either --targets-file or all of --cluster-id, --db-name, --user and --password.")
+
+    # Cluster provisioning is by far the slowest step, so it runs in the background
+    # while the bucket, upload and schema inference proceed. We only block on the
+    # clusters right before the first COPY.
+    print("=== Step 1: Create or Verify S3 Bucket (background) ===")
+    bucket_future = _run_in_background(create_s3_bucket, bucket, region)
 
     print("=== Step 2: Create or Reuse IAM Role ===")
     role_arn = create_iam_role(role_name)
 
-    print("=== Step 3: Create Redshift Cluster ===")
-    create_redshift_cluster(
-        cluster_id=cluster_id,
-        db_name=db_name,
-        user=user,
-        password=password,
-        role_arn=role_arn,
-        region=region
-    )
+    # Targets can share a cluster (one database each), so provision each cluster
+    # once; the first target's database and credentials are used to create it
+    cluster_futures = {}
+    for target in targets:
+        cluster_key = (target['cluster_id'], target['region'])
+        if cluster_key not in cluster_futures:
+            cluster_futures[cluster_key] = _run_in_background(
+                _timed,
+                create_redshift_cluster,
+                cluster_id=target['cluster_id'],
+                db_name=target['db_name'],
+                user=target['user'],
+                password=target['password'],
+                role_arn=role_arn,
+                region=target['region']
+            )
+    print(f"=== Step 3: Create {len(cluster_futures)} Redshift Cluster(s) (background) ===")
 
     print("=== Step 4: Upload CSV Files to S3 ===")
-    upload_to_s3(directory, bucket, region)
+    bucket_future.result()
+    upload_controller = AdaptiveConcurrencyController(
+        name="S3",
+        max_limit=max_upload_concurrency,
+        max_retries=max_retries,
+        max_bandwidth=max_bandwidth * 1024 * 1024 if max_bandwidth else None
+    )
+    upload_to_s3(directory, bucket, region, controller=upload_controller)
+    upload_controller.summary()
 
-    print("=== Step 5: Create Tables and COPY Data ===")
+    print("=== Step 5: Infer Table Schemas and Count Rows ===")
+    schemas = []
+    expected_rows = {}
     for csv_file in Path(directory).glob("*.csv"):
-        print(f"-> Processing file: {csv_file.name}")
+        print(f"-> Inferring schema: {csv_file.name}")
         table_name, create_sql = infer_schema_and_generate_sql(csv_file)
+        schemas.append((csv_file, table_name, create_sql))
+        if not skip_reconcile:
+            expected_rows[table_name] = count_csv_rows(csv_file)['data_rows']
+            print(f"-> {csv_file.name}: {expected_rows[table_name]} data row(s)")
+
+    print("=== Step 6: Wait for Redshift Cluster(s) ===")
+    blocked_start = time.monotonic()
+    healthy_targets, failed_targets, created_seconds = [], {}, {}
+    for target in targets:
+        cluster_key = (target['cluster_id'], target['region'])
+        try:
+            created, seconds = cluster_futures[cluster_key].result()
+        except Exception as e:
+            print(f"[{target['name']}] Cluster provisioning failed: {e}")
+            failed_targets[target['name']] = e
+            continue
+        healthy_targets.append(target)
+        if created:
+            created_seconds[cluster_key] = seconds
+    report_cluster_overlap(max(created_seconds.values(), default=0.0), time.monotonic() - blocked_start)
+
+    print(f"=== Step 7: Create Tables and COPY Data into {len(healthy_targets)} Target(s) ===")
+    reports = fan_out_load(
+        healthy_targets,
+        schemas,
+        bucket,
+        role_arn,
+        compupdate=compupdate,
+        statupdate=statupdate,
+        run_maintenance=not skip_maintenance,
+        analyze_threshold=analyze_threshold,
+        vacuum_threshold=vacuum_threshold,
+        vacuum_to_percent=vacuum_to_percent,
+        expected_rows=None if skip_reconcile else expected_rows,
+        controller_options={'max_retries': max_retries, 'max_queue_depth': max_wlm_queue},
+        bucket_region=region
+    )
+    reports.update(failed_targets)
 
-        create_table_and_copy(
-            table_name=table_name,
-            create_sql=create_sql,
-            bucket=bucket,
-            filename=csv_file.name,
-            cluster_id=cluster_id,
-            db_name=db_name,
-            user=user,
-            password=password,
-            region=region,
-            role_arn=role_arn
-        )
+    print("=== Load Report ===")
+    if not print_fan_out_report(reports):
+        raise click.ClickException("One or more targets failed to load.")
 
     print("✅ All CSVs processed and loaded into Redshift.")
 
@@ -0,0 +1,219 @@
+import random
+import re
+import threading
+import time
+
+import botocore
+import psycopg2
+
+THROTTLE_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', '503'}
+TRANSIENT_CODES = {'RequestTimeout', 'InternalError', 'ServiceUnavailable', '500'}
+
+
+def classify_error(exc):
+    """
+    Decide whether an S3/Redshift error is worth retrying.
+
+    Returns:
+    - 'throttle' if the service asked us to slow down (retry and cut concurrency)
+    - 'transient' if the call may succeed on retry
+    - None if the error should be raised immediately
+    """
+    if isinstance(exc, botocore.exceptions.ClientError):
+        code = str(exc.response.get('Error', {}).get('Code', ''))
+        status = exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return _classify_code(code, status)
+    if isinstance(exc, (botocore.exceptions.EndpointConnectionError,
+                        botocore.exceptions.ConnectionClosedError,
+                        botocore.exceptions.ReadTimeoutError)):
+        return 'transient'
+    if isinstance(exc, psycopg2.OperationalError):
+        message = str(exc).lower()
+        if 'authentication' in message:
+            return None
+        if 'wlm' in message or 'concurrency' in message or 'too many connections' in message:
+            return 'throttle'
+        return 'transient'
+
+    # upload_file wraps the underlying ClientError in S3UploadFailedError, raised
+    # while handling it, so look at the chained error first and fall back to the
+    # "An error occurred (Code)" text boto3 copies into the message
+    wrapped = exc.__cause__ or exc.__context__
+    if wrapped is not None and wrapped is not exc:
+        kind = classify_error(wrapped)
+        if kind is not None:
+            return kind
+    match = re.search(r'An error occurred \((\w+)\)', str(exc))
+    if match:
+        return _classify_code(match.group(1))
+    return None
+
+
+def _classify_code(code, status=None):
+    """Map an AWS error code (and optional HTTP status) to 'throttle', 'transient' or None."""
+    if code in THROTTLE_CODES or status == 503:
+        return 'throttle'
+    if code in TRANSIENT_CODES or status == 500:
+        return 'transient'
+    return None
+
+
+class AdaptiveConcurrencyController:
+    """
+    Shared AIMD controller for S3 uploads and Redshift COPYs.
+
+    Callers run work through call(), which waits for a free slot, retries
+    transient failures with jittered exponential backoff and adjusts the
+    concurrency limit: +1/limit per healthy call (additive increase) and
+    halved on throttling, latency spikes or a deep WLM queue (multiplicative
+    decrease, at most once per cooldown). Latency is compared against a
+    decaying average of earlier calls of similar size, since fixed per-call
+    overhead makes small calls far slower per byte than large ones. An optional bandwidth cap is
+    enforced with a token bucket through consume().
+    """
+
+    def __init__(self, name, max_limit, min_limit=1, initial_limit=None, max_retries=5,
+                 base_delay=0.5, max_delay=30.0, latency_factor=3.0, latency_alpha=0.2, max_queue_depth=None,
+                 cooldown=2.0, max_bandwidth=None, classify=classify_error, sleep=time.sleep):
+        if max_limit < min_limit or min_limit < 1:
+            raise ValueError(f"[{name}] Need 1 <= min_limit <= max_limit, got {min_limit}/{max_limit}.")
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial_limit or max(min_limit, max_limit // 2))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_factor = latency_factor
+        self.latency_alpha = latency_alpha
+        self.max_queue_depth = max_queue_depth
+        self.cooldown = cooldown
+        self.max_bandwidth = max_bandwidth
+        self.classify = classify
+        self.sleep = sleep
+
+        self.in_flight = 0
+        self.average_latency = {}
+        self.last_decrease = float('-inf')
+        self.stats = {'calls': 0, 'retries': 0, 'throttles': 0, 'decreases': 0, 'failures': 0}
+        self._cond = threading.Condition()
+        self._tokens = float(max_bandwidth or 0)
+        self._tokens_at = time.monotonic()
+        self._bandwidth_lock = threading.Lock()
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.current_limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _count(self, key):
+        with self._cond:
+            self.stats[key] += 1
+
+    def _increase(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, reason):
+        with self._cond:
+            now = time.monotonic()
+            if now - self.last_decrease < self.cooldown:
+                return
+            self.last_decrease = now
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.stats['decreases'] += 1
+        print(f"[{self.name}] {reason}; reducing concurrency to {self.current_limit}.")
+
+    @staticmethod
+    def size_bucket(size):
+        """Group payload sizes by powers of 4 so latencies are only compared between similar calls."""
+        return int(size).bit_length() // 2 if size else 0
+
+    def record_latency(self, seconds, size=None):
+        """Record a successful call; returns False if its latency counts as congestion."""
+        bucket = self.size_bucket(size)
+        with self._cond:
+            average = self.average_latency.get(bucket)
+            if average is None:
+                self.average_latency[bucket] = seconds
+            else:
+                self.average_latency[bucket] = average + self.latency_alpha * (seconds - average)
+        if self.latency_factor and average and seconds > average * self.latency_factor:
+            self._decrease(f"Latency {seconds / average:.1f}x above average for similar calls")
+            return False
+        self._increase()
+        return True
+
+    def observe_queue_depth(self, depth):
+        """Feed in the number of queued WLM queries; a deep queue cuts concurrency."""
+        if self.max_queue_depth is not None and depth > self.max_queue_depth:
+            self._decrease(f"WLM queue depth {depth} exceeds {self.max_queue_depth}")
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: uniform(0, min(max_delay, base * 2**attempt))."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def consume(self, nbytes):
+        """Block until nbytes fit under the bandwidth cap. Usable as a boto3 transfer Callback."""
+        if not self.max_bandwidth:
+            return
+        with self._bandwidth_lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_bandwidth, self._tokens + (now - self._tokens_at) * self.max_bandwidth)
+            self._tokens_at = now
+            self._tokens -= nbytes
+            deficit = -self._tokens
+        if deficit > 0:
+            self.sleep(deficit / self.max_bandwidth)
+
+    def call(self, func, *args, size=None, **kwargs):
+        """
+        Run func under the concurrency limit, retrying transient failures.
+
+        Parameters:
+        - size: Optional payload size in bytes, so latency is compared between calls of similar size
+
+        Returns:
+        - Whatever func returns; the last error is raised once retries run out
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind = self.classify(e)
+                if kind == 'throttle':
+                    self._count('throttles')
+                    self._decrease(f"Throttled ({e.__class__.__name__})")
+                if kind is None or attempt == self.max_retries:
+                    self._count('failures')
+                    raise
+                delay = self.backoff_delay(attempt)
+                self._count('retries')
+                print(f"[{self.name}] Transient error ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            else:
+                self._count('calls')
+                self.record_latency(time.monotonic() - start, size)
+                return result
+            finally:
+                self.release()
+            self.sleep(delay)
+
+    def summary(self):
+        """Print and return the controller's counters."""
+        print(f"[{self.name}] calls={self.stats['calls']} retries={self.stats['retries']} "
+              f"throttles={self.stats['throttles']} decreases={self.stats['decreases']} "
+              f"failures={self.stats['failures']} final_limit={self.current_limit}")
+        return dict(self.stats, final_limit=self.current_limit)
@@ -0,0 +1,188 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from uploader.concurrency import AdaptiveConcurrencyController
+from uploader.redshift_utils import create_table_and_copy, run_post_load_maintenance
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def load_targets_file(path, default_region='us-east-1'):
+    """
+    Read a JSON file describing the Redshift targets to load into.
+
+    The file holds a list of objects, e.g.:
+        [{"name": "staging", "cluster_id": "stg", "db_name": "dev",
+          "user": "admin", "password": "...", "max_concurrency": 2}]
+
+    Returns:
+    - List of target dicts with 'name', 'region' and 'max_concurrency' filled in
+    """
+    with open(Path(path)) as f:
+        raw_targets = json.load(f)
+
+    if not isinstance(raw_targets, list) or not raw_targets:
+        raise ValueError(f"[Targets] '{path}' must contain a non-empty list of targets.")
+
+    targets = []
+    names = set()
+    databases = set()
+    for i, raw in enumerate(raw_targets):
+        missing = [key for key in ('cluster_id', 'db_name', 'user', 'password') if not raw.get(key)]
+        if missing:
+            raise ValueError(f"[Targets] Target #{i} in '{path}' is missing: {', '.join(missing)}")
+        targets.append(make_target(
+            cluster_id=raw['cluster_id'],
+            db_name=raw['db_name'],
+            user=raw['user'],
+            password=raw['password'],
+            region=raw.get('region', default_region),
+            max_concurrency=raw.get('max_concurrency', DEFAULT_MAX_CONCURRENCY),
+            name=raw.get('name'),
+        ))
+        if targets[-1]['name'] in names:
+            raise ValueError(f"[Targets] Duplicate target name '{targets[-1]['name']}' in '{path}'.")
+        names.add(targets[-1]['name'])
+        # Two targets loading the same database would DROP and COPY the same tables concurrently
+        database = (targets[-1]['cluster_id'], targets[-1]['region'], targets[-1]['db_name'])
+        if database in databases:
+            raise ValueError(f"[Targets] Database '{database[2]}' on cluster '{database[0]}' "
+                             f"is listed more than once in '{path}'.")
+        databases.add(database)
+    return targets
+
+
+def make_target(cluster_id, db_name, user, password, region, max_concurrency=DEFAULT_MAX_CONCURRENCY, name=None):
+    """Build a target dict, naming it '<cluster_id>/<db_name>' unless a name is given."""
+    if int(max_concurrency) < 1:
+        raise ValueError(f"[Targets] max_concurrency must be at least 1 for '{cluster_id}'.")
+    return {
+        'name': name or f"{cluster_id}/{db_name}",
+        'cluster_id': cluster_id,
+        'db_name': db_name,
+        'user': user,
+        'password': password,
+        'region': region,
+        'max_concurrency': int(max_concurrency),
+    }
+
+
+def load_into_target(target, schemas, bucket, role_arn, compupdate=None, statupdate=None,
+                     run_maintenance=True, analyze_threshold=10.0, vacuum_threshold=5.0, vacuum_to_percent=None,
+                     expected_rows=None, controller_options=None, bucket_region=None):
+    """
+    COPY every inferred table into a single target, up to max_concurrency at a time.
+
+    If controller_options is given, an AdaptiveConcurrencyController built from
+    it (capped at the target's max_concurrency) adjusts how many COPYs run at
+    once and retries transient failures.
+
+    Parameters:
+    - target: Target dict from make_target/load_targets_file
+    - schemas: List of (csv_file, table_name, create_sql) already uploaded to S3
+    - expected_rows: Optional dict of table name to source data row count for reconciliation
+    - bucket_region: Region of the S3 bucket, for targets in a different region
+
+    Returns:
+    - Dict mapping table name to True (loaded) or False (failed)
+    """
+    controller = None
+    if controller_options is not None:
+        controller = AdaptiveConcurrencyController(
+            name=target['name'], max_limit=target['max_concurrency'], **controller_options
+        )
+
+    def copy_one(schema):
+        csv_file, table_name, create_sql = schema
+        print(f"[{target['name']}] -> Processing file: {csv_file.name}")
+        try:
+            return table_name, create_table_and_copy(
+                table_name=table_name,
+                create_sql=create_sql,
+                bucket=bucket,
+                filename=csv_file.name,
+                cluster_id=target['cluster_id'],
+                db_name=target['db_name'],
+                user=target['user'],
+                password=target['password'],
+                region=target['region'],
+                role_arn=role_arn,
+                compupdate=compupdate,
+                statupdate=statupdate,
+                expected_rows=(expected_rows or {}).get(table_name),
+                controller=controller,
+                bucket_region=bucket_region,
+                size=csv_file.stat().st_size if controller is not None else None
+            )
+        except Exception as e:
+            print(f"[{target['name']}] Error loading {table_name}: {e}")
+            return table_name, False
+
+    with ThreadPoolExecutor(max_workers=target['max_concurrency']) as executor:
+        results = dict(executor.map(copy_one, schemas))
+    if controller is not None:
+        controller.summary()
+
+    loaded = [table for table, ok in results.items() if ok]
+    if run_maintenance and loaded:
+        run_post_load_maintenance(
+            table_names=loaded,
+            cluster_id=target['cluster_id'],
+            db_name=target['db_name'],
+            user=target['user'],
+            password=target['password'],
+            region=target['region'],
+            analyze_threshold=analyze_threshold,
+            vacuum_threshold=vacuum_threshold,
+            vacuum_to_percent=vacuum_to_percent
+        )
+    return results
+
+
+def fan_out_load(targets, schemas, bucket, role_arn, **load_kwargs):
+    """
+    Load the same uploaded files into every target in parallel.
+
+    Returns:
+    - Dict mapping target name to its per-table results, or to the exception
+      raised if the target failed as a whole
+    """
+    if not targets:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {
+            target['name']: executor.submit(load_into_target, target, schemas, bucket, role_arn, **load_kwargs)
+            for target in targets
+        }
+
+    reports = {}
+    for name, future in futures.items():
+        try:
+            reports[name] = future.result()
+        except Exception as e:
+            print(f"[{name}] Target failed: {e}")
+            reports[name] = e
+    return reports
+
+
+def print_fan_out_report(reports):
+    """
+    Print a success/failure summary per target.
+
+    Returns:
+    - True if every table loaded into every target, else False
+    """
+    all_ok = True
+    for name, result in reports.items():
+        if isinstance(result, Exception):
+            print(f"[{name}] ❌ FAILED: {result}")
+            all_ok = False
+            continue
+        failed = [table for table, ok in result.items() if not ok]
+        if failed:
+            print(f"[{name}] ❌ {len(result) - len(failed)}/{len(result)} table(s) loaded; failed: {', '.join(failed)}")
+            all_ok = False
+        else:
+            print(f"[{name}] ✅ {len(result)} table(s) loaded.")
+    return all_ok
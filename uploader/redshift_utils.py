@@ -5,13 +5,18 @@ import botocore
 import requests
 
 def create_redshift_cluster(cluster_id, db_name, user, password, role_arn, region):
-    """Creates a Redshift cluster with the provided config if it does not already exist."""
+    """
+    Creates a Redshift cluster with the provided config if it does not already exist.
+
+    Returns:
+    - True if a new cluster was created and waited on, False if it already existed
+    """
     redshift = boto3.client('redshift', region_name=region)
     
     try:
         redshift.describe_clusters(ClusterIdentifier=cluster_id)
         print(f"[Redshift] Cluster '{cluster_id}' already exists.")
-        return
+        return False
     except botocore.exceptions.ClientError as e:
         if e.response['Error']['Code'] != 'ClusterNotFound':
             raise
@@ -34,6 +39,7 @@ def create_redshift_cluster(cluster_id, db_name, user, password, role_arn, regio
     print("[Redshift] Waiting for cluster to become available...")
     waiter.wait(ClusterIdentifier=cluster_id)
     print("[Redshift] Cluster is now available.")
+    return True
 
 def authorize_redshift_ingress(cluster_id, region="us-east-1"):
     redshift = boto3.client("redshift", region_name=region)
@@ -105,36 +111,187 @@ def get_redshift_connection(cluster_id, db_name, user, password, region):
     )
     return conn
 
-def create_table_and_copy(table_name, create_sql, bucket, filename, cluster_id, db_name, user, password, region, role_arn):
-    """Create a Redshift table and load data from S3."""
+def _copy_options(compupdate=None, statupdate=None, bucket_region=None):
+    """Build the optional REGION/COMPUPDATE/STATUPDATE clauses for a COPY command."""
+    options = ""
+    if bucket_region is not None:
+        options += f"\n                REGION '{bucket_region}'"
+    if compupdate is not None:
+        options += f"\n                COMPUPDATE {compupdate.upper()}"
+    if statupdate is not None:
+        options += f"\n                STATUPDATE {statupdate.upper()}"
+    return options
+
+def get_wlm_queue_depth(cur):
+    """Return the number of queries currently queued in workload management (WLM)."""
+    cur.execute("SELECT COUNT(*) FROM stv_wlm_query_state WHERE state LIKE 'Queued%'")
+    return cur.fetchone()[0]
+
+def reconcile_row_counts(cur, table_name, expected_rows):
+    """
+    Compare the source row count with what the last COPY in this session loaded and rejected.
+
+    Returns:
+    - (loaded_rows, rejected_rows, matches)
+    """
+    cur.execute('SELECT pg_last_copy_count()')
+    loaded = cur.fetchone()[0]
+    cur.execute('SELECT COUNT(*) FROM stl_load_errors WHERE query = pg_last_copy_id()')
+    rejected = cur.fetchone()[0]
+
+    matches = loaded + rejected == expected_rows
+    if not matches:
+        print(f"[Redshift] ⚠️ Row count mismatch for {table_name}: source has {expected_rows} row(s), "
+              f"loaded {loaded}, rejected {rejected}.")
+    elif rejected:
+        print(f"[Redshift] {table_name}: loaded {loaded} row(s), rejected {rejected} (see stl_load_errors).")
+    else:
+        print(f"[Redshift] {table_name}: all {loaded} source row(s) loaded.")
+    return loaded, rejected, matches
+
+def create_table_and_copy(table_name, create_sql, bucket, filename, cluster_id, db_name, user, password, region, role_arn,
+                          compupdate=None, statupdate=None, expected_rows=None, controller=None, size=None,
+                          bucket_region=None):
+    """
+    Create a Redshift table and load data from S3.
+
+    compupdate ('ON', 'OFF' or 'PRESET') and statupdate ('ON' or 'OFF') are passed
+    through to the COPY command; None leaves Redshift's default behaviour.
+    bucket_region adds a REGION clause when the bucket is not in the cluster's region.
+    If expected_rows is given, the loaded and rejected row counts are reconciled
+    against it after the COPY.
+    If an AdaptiveConcurrencyController is given, the load runs under its
+    concurrency limit and is retried on transient errors with a fresh
+    connection; size (source bytes) lets it compare COPY latency between
+    files of similar size.
+
+    Returns:
+    - True if the table was created and loaded (and reconciled, if requested), else False
+    """
     print(f"[Redshift] Creating Inbound rule for '{cluster_id}' to enable Redshift access...")
     authorize_redshift_ingress(cluster_id, region)
-    print(f"[Redshift] Connecting to cluster '{cluster_id}' to create table and load data...")
-    conn = get_redshift_connection(cluster_id, db_name, user, password, region)
-    cur = conn.cursor()
+    cross_region = bucket_region if bucket_region and bucket_region != region else None
+
+    def attempt():
+        print(f"[Redshift] Connecting to cluster '{cluster_id}' to create table and load data...")
+        conn = get_redshift_connection(cluster_id, db_name, user, password, region)
+        cur = conn.cursor()
+
+        try:
+            if controller is not None:
+                controller.observe_queue_depth(get_wlm_queue_depth(cur))
+
+            cur.execute(f'DROP TABLE IF EXISTS {table_name}')
+            cur.execute(create_sql)
+            print(f"[Redshift] Created table: {table_name}")
+
+            copy_sql = f"""
+                COPY {table_name}
+                FROM 's3://{bucket}/{filename}'
+                IAM_ROLE '{role_arn}'
+                FORMAT AS CSV
+                ACCEPTINVCHARS
+                EMPTYASNULL
+                BLANKSASNULL
+                IGNOREHEADER 1
+                MAXERROR 100{_copy_options(compupdate, statupdate, cross_region)};
+            """
+            cur.execute(copy_sql)
+            conn.commit()
+            print(f"[Redshift] Loaded data into {table_name} from S3.")
+
+            if expected_rows is not None:
+                return reconcile_row_counts(cur, table_name, expected_rows)[2]
+            return True
+        except Exception:
+            # A dropped connection is already closed; rolling back would replace
+            # the original (retryable) error with InterfaceError
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if not conn.closed:
+                cur.close()
+            conn.close()
 
     try:
-        cur.execute(f'DROP TABLE IF EXISTS {table_name}')
-        cur.execute(create_sql)
-        print(f"[Redshift] Created table: {table_name}")
-
-        copy_sql = f"""
-            COPY {table_name}
-            FROM 's3://{bucket}/{filename}'
-            IAM_ROLE '{role_arn}'
-            FORMAT AS CSV
-            ACCEPTINVCHARS
-            EMPTYASNULL
-            BLANKSASNULL
-            IGNOREHEADER 1
-            MAXERROR 100;
-        """
-        cur.execute(copy_sql)
-        conn.commit()
-        print(f"[Redshift] Loaded data into {table_name} from S3.")
+        if controller is None:
+            return attempt()
+        return controller.call(attempt, size=size)
     except Exception as e:
         print(f"[Redshift] Error: {e}")
-        conn.rollback()
+        return False
+
+
+def get_tables_needing_maintenance(cur, table_names, analyze_threshold=10.0, vacuum_threshold=5.0):
+    """
+    Look up SVV_TABLE_INFO for the given tables in the current schema and decide
+    which need maintenance.
+
+    Parameters:
+    - cur: Open psycopg2 cursor
+    - table_names: Tables loaded during this run
+    - analyze_threshold: Run ANALYZE when stats_off (% of stale statistics) exceeds this
+    - vacuum_threshold: Run VACUUM when unsorted (% of unsorted rows) exceeds this
+
+    Returns:
+    - (tables_to_analyze, tables_to_vacuum)
+    """
+    if not table_names:
+        return [], []
+
+    cur.execute(
+        'SELECT "table", stats_off, unsorted FROM svv_table_info '
+        'WHERE "schema" = current_schema() AND "table" IN %s',
+        (tuple(table_names),)
+    )
+    to_analyze, to_vacuum = [], []
+    for table, stats_off, unsorted in cur.fetchall():
+        if stats_off is not None and stats_off > analyze_threshold:
+            to_analyze.append(table)
+        if unsorted is not None and unsorted > vacuum_threshold:
+            to_vacuum.append(table)
+    return to_analyze, to_vacuum
+
+
+def run_post_load_maintenance(table_names, cluster_id, db_name, user, password, region,
+                              analyze_threshold=10.0, vacuum_threshold=5.0, vacuum_to_percent=None):
+    """
+    Run ANALYZE/VACUUM on loaded tables whose changed or unsorted rows exceed a threshold.
+
+    Intended to run once after all COPY commands have finished, so maintenance
+    does not compete with the loads themselves. vacuum_to_percent sets the VACUUM
+    sort target; None uses Redshift's default (95 percent). Maintenance failures,
+    including failing to connect, are logged rather than raised since the loads
+    have already committed.
+    """
+    print(f"[Redshift] Checking {len(table_names)} table(s) for post-load maintenance...")
+    conn = cur = None
+
+    try:
+        conn = get_redshift_connection(cluster_id, db_name, user, password, region)
+        # VACUUM cannot run inside a transaction block
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        to_analyze, to_vacuum = get_tables_needing_maintenance(
+            cur, table_names, analyze_threshold, vacuum_threshold
+        )
+        for table in to_vacuum:
+            if vacuum_to_percent is None:
+                cur.execute(f'VACUUM {table}')
+            else:
+                cur.execute(f'VACUUM {table} TO {int(vacuum_to_percent)} PERCENT')
+            print(f"[Redshift] Vacuumed {table}")
+        for table in to_analyze:
+            cur.execute(f'ANALYZE {table}')
+            print(f"[Redshift] Analyzed {table}")
+        if not to_analyze and not to_vacuum:
+            print("[Redshift] No tables exceeded the maintenance thresholds.")
+    except Exception as e:
+        print(f"[Redshift] Maintenance error: {e}")
     finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
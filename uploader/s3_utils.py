@@ -1,5 +1,6 @@
 import boto3
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -81,24 +82,44 @@ def get_aws_account_id():
         return None
     
 
-def upload_to_s3(directory, bucket_name, region):
-    """Upload all CSV files in a directory to the specified S3 bucket."""
+def upload_to_s3(directory, bucket_name, region, controller=None):
+    """
+    Upload all CSV files in a directory to the specified S3 bucket.
+
+    If an AdaptiveConcurrencyController is given, files are uploaded in parallel
+    under its concurrency limit, bandwidth cap and retry policy; otherwise they
+    are uploaded one at a time.
+    """
     s3 = boto3.client('s3', region_name=region)
     directory = Path(directory)
 
     if not directory.exists():
         raise ValueError(f"[S3] Directory '{directory}' does not exist.")
 
-    files_uploaded = 0
-    for file in directory.glob("*.csv"):
+    def upload_one(file):
         s3_key = file.name
         try:
-            s3.upload_file(str(file), bucket_name, s3_key)
+            if controller is None:
+                s3.upload_file(str(file), bucket_name, s3_key)
+            else:
+                controller.call(
+                    s3.upload_file, str(file), bucket_name, s3_key,
+                    Callback=controller.consume, size=file.stat().st_size
+                )
             print(f"[S3] Uploaded '{file.name}' to bucket '{bucket_name}' as '{s3_key}'")
-            files_uploaded += 1
+            return True
         except Exception as e:
             print(f"[S3] Error uploading {file.name}: {e}")
-    
+            return False
+
+    files = list(directory.glob("*.csv"))
+    if controller is None:
+        results = [upload_one(file) for file in files]
+    else:
+        with ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
+            results = list(executor.map(upload_one, files))
+    files_uploaded = sum(results)
+
     if files_uploaded == 0:
         print("[S3] No CSV files found in the directory.")
     else: